@@ -1,11 +1,162 @@
+import difflib
+import os
+
+import numpy as np
+
 from utils import *
 
+B_i3 = 1 / 6 * np.array([[-1, 3, -3, 1], [3, -6, 3, 0], [-3, 0, 3, 0], [1, 4, 1, 0]])
+dB_i3 = 0.5 * np.array([[-1, 3, -3, 1], [2, -4, 2, 0], [-1, 0, 1, 0]])
+SAMPLES = np.arange(0, 1, 0.05)
+
+
+def control_points(bspline, i):
+    return np.array([bspline.vertices[i - 1], bspline.vertices[i], bspline.vertices[i + 1], bspline.vertices[i + 2]])
+
+
+def bspline_approximation(bspline, t, i):
+    T_3 = np.array([t ** 3, t ** 2, t, 1])
+    return T_3 @ B_i3 @ control_points(bspline, i)
+
+
+def bspline_tangent(bspline, t, i):
+    T_2 = np.array([t ** 2, t, 1])
+    return T_2 @ dB_i3 @ control_points(bspline, i)
+
+
 class Bspline:
     vertices = []
     scale = None
+    curve = None
+    dirty = None
+    dirty_from = None
 
     def __init__(self, file):
         bspline_vertices, xyz = load_vertices(file)
-        self.vertices = bspline_vertices
-        scale = max(max(xyz[0]) - min(xyz[0]), max(xyz[1]) - min(xyz[1]), max(xyz[2]) - min(xyz[2]))
-        self.scale = scale
+        self.file = file
+        self.mtime = os.path.getmtime(file)
+        self.rebuild(bspline_vertices)
+
+    @property
+    def block(self):
+        return 2 * len(SAMPLES)
+
+    def segment_count(self):
+        return len(self.vertices) - 2
+
+    def rebuild(self, vertices):
+        self.vertices = vertices
+        self.update_scale()
+        self.dirty = set()
+        self.dirty_from = 0
+
+        # line pairs (point, point + tangent) for every segment, one block of rows per segment
+        self.curve = np.zeros((self.segment_count() * self.block, 3), dtype=np.float32)
+        for i in range(self.segment_count()):
+            self.evaluate(i)
+
+    def update_scale(self):
+        xyz = np.array(self.vertices)
+        self.scale = max(np.ptp(xyz, axis=0))
+
+    def affected(self, k):
+        # segment i uses vertices i-1 .. i+2, and segment 0 wraps around to the last one
+        n = len(self.vertices)
+        segments = set(range(max(0, k - 2), min(self.segment_count(), k + 2)))
+        if k == n - 1:
+            segments.add(0)
+        return sorted(segments)
+
+    def evaluate(self, i):
+        T_3 = np.stack([SAMPLES ** 3, SAMPLES ** 2, SAMPLES, np.ones_like(SAMPLES)], axis=1)
+        T_2 = np.stack([SAMPLES ** 2, SAMPLES, np.ones_like(SAMPLES)], axis=1)
+        R_i = control_points(self, i)
+        p = T_3 @ B_i3 @ R_i
+        dp = T_2 @ dB_i3 @ R_i
+
+        rows = self.curve[i * self.block:(i + 1) * self.block]
+        rows[0::2] = p
+        rows[1::2] = p + dp
+        self.dirty.add(i)
+
+    def path(self):
+        # points on the curve, the odd rows of curve are tangent tips
+        return self.curve[0::2]
+
+    def shifted(self, pos):
+        # rows from pos on moved, so they all have to be uploaded again
+        self.dirty_from = pos if self.dirty_from is None else min(self.dirty_from, pos)
+
+    def take_dirty(self):
+        # (first shifted row or None, edited segments) since the last call
+        dirty_from, dirty = self.dirty_from, sorted(self.dirty)
+        self.dirty_from, self.dirty = None, set()
+        return dirty_from, dirty
+
+    def move(self, k, vertex):
+        self.vertices[k] = list(vertex)
+        for i in self.affected(k):
+            self.evaluate(i)
+        self.update_scale()
+
+    def insert(self, k, vertex):
+        # segments left of k keep their rows, the ones right of it just shift by one block
+        pos = max(0, min(k, self.segment_count())) * self.block
+        self.vertices.insert(k, list(vertex))
+        self.curve = np.insert(self.curve, pos, np.zeros((self.block, 3), dtype=np.float32), axis=0)
+        self.shifted(pos)
+        for i in self.affected(k):
+            self.evaluate(i)
+        self.update_scale()
+
+    def delete(self, k):
+        if len(self.vertices) <= 3:
+            raise ValueError("B-spline needs at least 3 control points")
+        last = k == len(self.vertices) - 1
+        pos = max(0, min(k, self.segment_count() - 1)) * self.block
+        del self.vertices[k]
+        self.curve = np.delete(self.curve, np.s_[pos:pos + self.block], axis=0)
+        self.shifted(pos)
+
+        segments = set(range(max(0, k - 2), min(self.segment_count(), k + 1)))
+        if last:
+            segments.add(0)
+        for i in sorted(segments):
+            self.evaluate(i)
+        self.update_scale()
+
+    def reload(self):
+        # hot reload, only the control points that differ from the file get edited
+        try:
+            mtime = os.path.getmtime(self.file)
+            if mtime == self.mtime:
+                return False
+            self.mtime = mtime
+            new_vertices, xyz = load_vertices(self.file)
+        except (OSError, ValueError, IndexError):
+            # file caught mid-save (or mid-rename), the next poll will pick it up
+            self.mtime = None
+            return False
+
+        old = [tuple(v) for v in self.vertices]
+        new = [tuple(v) for v in new_vertices]
+        if len(new) < 3 or old == new:
+            return False
+
+        # apply from the end so earlier indices stay valid
+        opcodes = difflib.SequenceMatcher(None, old, new, autojunk=False).get_opcodes()
+        try:
+            for tag, i1, i2, j1, j2 in reversed(opcodes):
+                if tag == 'equal':
+                    continue
+                common = min(i2 - i1, j2 - j1)
+                for k in range(common):
+                    self.move(i1 + k, new[j1 + k])
+                for k in range(common, j2 - j1):
+                    self.insert(i1 + k, new[j1 + k])
+                for k in reversed(range(common, i2 - i1)):
+                    self.delete(i1 + k)
+        except ValueError:
+            # an intermediate step went below 3 points, just start over
+            self.rebuild(new_vertices)
+        return True
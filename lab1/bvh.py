@@ -0,0 +1,309 @@
+import numpy as np
+
+LEAF_SIZE = 16
+# queries start this many levels down, testing a few more boxes at once beats walking the top
+TOP_DEPTH = 4
+
+
+class BVH:
+    def __init__(self, vertices, polygons):
+        # triangles as an (m, 3, 3) array, polygons are 1-indexed like in the .obj file
+        self.triangles = np.array(vertices, dtype=float)[np.array(polygons, dtype=int) - 1]
+
+        # flat node arrays, a node is a leaf when count > 0
+        self.bbox_min = []
+        self.bbox_max = []
+        # one mesh vertex per node, its distance bounds the distance to anything in the node
+        self.anchor = []
+        self.left = []
+        self.right = []
+        self.start = []
+        self.count = []
+        depth = []
+
+        centroids = self.triangles.mean(axis=1)
+        self.order = np.arange(len(self.triangles))
+        if len(self.triangles):
+            self.build(centroids, 0, len(self.triangles), depth)
+
+        self.bbox_min = np.array(self.bbox_min).reshape(-1, 3)
+        self.bbox_max = np.array(self.bbox_max).reshape(-1, 3)
+        self.anchor = np.array(self.anchor).reshape(-1, 3)
+        # the same per node, gathered with one index in the distance queries
+        self.node_table = np.hstack((self.bbox_min, self.bbox_max, self.anchor))
+        self.left = np.array(self.left, dtype=int)
+        self.right = np.array(self.right, dtype=int)
+        self.children = np.column_stack((self.left, self.right))
+        self.start = np.array(self.start, dtype=int)
+        self.count = np.array(self.count, dtype=int)
+        depth = np.array(depth, dtype=int)
+        self.root = np.arange(min(1, len(self.count)))
+        self.top = np.flatnonzero((depth == TOP_DEPTH) | ((depth < TOP_DEPTH) & (self.count > 0)))
+        # triangles stored in leaf order so every leaf is one contiguous slice
+        self.leaf_triangles = Triangles(self.triangles[self.order])
+
+    def build(self, centroids, start, end, depth, level=0):
+        node = len(self.count)
+        depth.append(level)
+        tris = self.triangles[self.order[start:end]]
+        self.bbox_min.append(tris.min(axis=(0, 1)))
+        self.bbox_max.append(tris.max(axis=(0, 1)))
+        corners = tris.reshape(-1, 3)
+        center = (self.bbox_min[-1] + self.bbox_max[-1]) / 2
+        self.anchor.append(corners[np.argmin(norm(corners - center))])
+        self.left.append(-1)
+        self.right.append(-1)
+        self.start.append(start)
+        self.count.append(end - start)
+
+        if end - start <= LEAF_SIZE:
+            return node
+
+        # median split along the longest axis of the centroid bounds
+        c = centroids[self.order[start:end]]
+        axis = np.argmax(c.max(axis=0) - c.min(axis=0))
+        mid = (end - start) // 2
+        split = np.argpartition(c[:, axis], mid)
+        self.order[start:end] = self.order[start:end][split]
+
+        self.count[node] = 0
+        self.left[node] = self.build(centroids, start, start + mid, depth, level + 1)
+        self.right[node] = self.build(centroids, start + mid, end, depth, level + 1)
+        return node
+
+    def leaf_ids(self, leaves):
+        # positions in leaf_triangles of every triangle in the given leaves
+        counts = self.count[leaves]
+        first = np.repeat(self.start[leaves] - np.cumsum(counts) + counts, counts)
+        return first + np.arange(counts.sum())
+
+    def collect(self, keep, queries=1, top=None):
+        # breadth-first walk, a whole tree level at a time, for several queries at once;
+        # keep(nodes, query) masks the (node, query) pairs worth opening,
+        # returns the leaves reached and the query each one belongs to
+        top = self.top if top is None else top
+        nodes = np.repeat(top, queries)
+        query = np.arange(queries * len(top)) % queries
+        leaves, leaf_query = [nodes[:0]], [query[:0]]
+        while len(nodes):
+            mask = keep(nodes, query)
+            nodes, query = nodes[mask], query[mask]
+            is_leaf = self.count[nodes] > 0
+            leaves.append(nodes[is_leaf])
+            leaf_query.append(query[is_leaf])
+            inner = ~is_leaf
+            nodes = self.children[nodes[inner]].ravel()
+            query = query[inner].repeat(2)
+        return np.concatenate(leaves), np.concatenate(leaf_query)
+
+    def intersect(self, origin, direction):
+        # closest hit along the ray as (t, polygon index), or None
+        origin = np.asarray(origin, dtype=float)
+        direction = np.asarray(direction, dtype=float)
+        with np.errstate(divide='ignore'):
+            inv_dir = 1 / direction
+
+        leaves, _ = self.collect(lambda nodes, _: ray_boxes(origin, inv_dir, self.bbox_min[nodes], self.bbox_max[nodes]))
+        ids = self.leaf_ids(leaves)
+        if not len(ids):
+            return None
+        t = ray_triangles(origin, direction, self.leaf_triangles[ids])
+        k = np.argmin(t)
+        if np.isinf(t[k]):
+            return None
+        return float(t[k]), int(self.order[ids[k]])
+
+    def candidates(self, bounds, max_dist, queries=1, top=None):
+        # branch and bound: bounds(node_table rows, query) gives lower and upper bounds of the distance
+        # to anything inside; returns the triangles (as leaf_triangles positions) that can still be
+        # the nearest over all queries, with the query each one belongs to
+        bound = [max_dist]
+
+        def keep(nodes, query):
+            lower, upper = bounds(self.node_table[nodes], query)
+            if len(nodes):
+                bound[0] = min(bound[0], upper.min())
+            return lower <= bound[0]
+
+        leaves, query = self.collect(keep, queries, top)
+        close = bounds(self.node_table[leaves], query)[0] <= bound[0]
+        leaves, query = leaves[close], query[close]
+        return self.leaf_ids(leaves), np.repeat(query, self.count[leaves])
+
+    def closest_point(self, point, max_dist=np.inf):
+        # nearest point on the mesh as (distance, point on mesh, polygon index), or None
+        point = np.asarray(point, dtype=float)
+        ids, _ = self.candidates(lambda rows, _: (box_distance(point, rows[:, 0:3], rows[:, 3:6]),
+                                                  norm(rows[:, 6:9] - point)),
+                                 max_dist)
+        if not len(ids):
+            return None
+        q = closest_on_triangles(point, self.leaf_triangles[ids])
+        d = norm(q - point)
+        k = np.argmin(d)
+        if d[k] > max_dist:
+            return None
+        return float(d[k]), q[k], int(self.order[ids[k]])
+
+    def clearance(self, path):
+        # smallest distance between the mesh and a polyline as (distance, segment index, polygon index);
+        # the points have to be in the mesh's own frame, see to_object_frame in main.py.
+        # every segment is one query of a single walk, so the bound found by one prunes the others;
+        # with that many queries the walk starts at the root, the top levels cut most segments
+        path = np.asarray(path, dtype=float)
+        if len(path) < 2:
+            return None
+        p, q = path[:-1], path[1:]
+        segments = np.hstack((np.minimum(p, q), np.maximum(p, q), p, q))
+
+        def bounds(rows, s):
+            seg = segments[s]
+            # the segment start is on the segment, so its distance to the anchor is an upper bound
+            return (boxes_gap(seg[:, 0:3], seg[:, 3:6], rows[:, 0:3], rows[:, 3:6]),
+                    norm(rows[:, 6:9] - seg[:, 6:9]))
+
+        ids, seg = self.candidates(bounds, np.inf, len(p), self.root)
+        if not len(ids):
+            return None
+
+        # same bounds once more per triangle: a vertex from above, the triangle's box from below
+        tri, pair = self.leaf_triangles[ids], segments[seg]
+        bound = norm(tri.a - pair[:, 6:9]).min()
+        close = boxes_gap(pair[:, 0:3], pair[:, 3:6], tri.box_min, tri.box_max) <= bound
+        ids, seg, pair = ids[close], seg[close], pair[close]
+
+        d = segment_triangles(pair[:, 6:9], pair[:, 9:12], self.leaf_triangles[ids])
+        k = np.argmin(d)
+        return float(d[k]), int(seg[k]), int(self.order[ids[k]])
+
+
+def dot(a, b):
+    return np.einsum('...i,...i->...', a, b)
+
+
+def norm(v):
+    return np.sqrt(dot(v, v))
+
+
+class Triangles:
+    # per-triangle terms every query needs, computed once and gathered with one index
+    def __init__(self, triangles):
+        a, b, c = triangles[:, 0], triangles[:, 1], triangles[:, 2]
+        ab, ac, bc = b - a, c - a, c - b
+        d00, d01, d11 = dot(ab, ab), dot(ab, ac), dot(ac, ac)
+        self.data = np.column_stack((a, b, ab, ac, bc, np.cross(ab, ac), d00, d01, d11, d00 * d11 - d01 * d01, dot(bc, bc),
+                                     triangles.min(axis=1), triangles.max(axis=1)))
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, ids):
+        subset = Triangles.__new__(Triangles)
+        subset.data = self.data[ids]
+        return subset
+
+    a = property(lambda self: self.data[:, 0:3])
+    b = property(lambda self: self.data[:, 3:6])
+    ab = property(lambda self: self.data[:, 6:9])
+    ac = property(lambda self: self.data[:, 9:12])
+    bc = property(lambda self: self.data[:, 12:15])
+    normal = property(lambda self: self.data[:, 15:18])
+    d00 = property(lambda self: self.data[:, 18])
+    d01 = property(lambda self: self.data[:, 19])
+    d11 = property(lambda self: self.data[:, 20])
+    denom = property(lambda self: self.data[:, 21])
+    bc2 = property(lambda self: self.data[:, 22])
+    box_min = property(lambda self: self.data[:, 23:26])
+    box_max = property(lambda self: self.data[:, 26:29])
+
+
+def barycentric(ap, tri):
+    # (v, w) of the projection of a + ap onto the plane, as a + v ab + w ac
+    d1, d2 = dot(ap, tri.ab), dot(ap, tri.ac)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        v = (tri.d11 * d1 - tri.d01 * d2) / tri.denom
+        w = (tri.d00 * d2 - tri.d01 * d1) / tri.denom
+    # nan and inf from degenerate triangles fail the test
+    return v, w, (v >= 0) & (w >= 0) & (v + w <= 1), d1, d2
+
+
+def ray_boxes(origin, inv_dir, bbox_min, bbox_max):
+    with np.errstate(invalid='ignore'):
+        t1 = (bbox_min - origin) * inv_dir
+        t2 = (bbox_max - origin) * inv_dir
+    # nan comes from 0 * inf when the ray lies in a slab plane, fmin/fmax skip it
+    t_near = np.fmax.reduce(np.fmin(t1, t2), axis=1)
+    t_far = np.fmin.reduce(np.fmax(t1, t2), axis=1)
+    return t_far >= np.maximum(t_near, 0)
+
+
+def ray_triangles(origin, direction, tri, eps=1e-9):
+    # plane hit then barycentric test, inf where there is no hit
+    dn = dot(tri.normal, direction)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = dot(tri.a - origin, tri.normal) / dn
+    v, w, inside, _, _ = barycentric(origin - tri.a + t[:, None] * direction, tri)
+    return np.where(inside & (np.abs(dn) > 0) & (t > eps), t, np.inf)
+
+
+def box_distance(point, bbox_min, bbox_max):
+    return norm(np.maximum(0, np.maximum(bbox_min - point, point - bbox_max)))
+
+
+def boxes_gap(a_min, a_max, bbox_min, bbox_max):
+    return norm(np.maximum(0, np.maximum(bbox_min - a_max, a_min - bbox_max)))
+
+
+def closest_on_triangles(p, tri):
+    # inside the triangle it is the projection onto its plane, otherwise the nearest edge
+    ap = p - tri.a
+    v, w, inside, d1, d2 = barycentric(ap, tri)
+    # edges of zero length give nan, clip keeps it and the where below maps it to 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.clip(np.stack((d1 / tri.d00, d2 / tri.d11, dot(p - tri.b, tri.bc) / tri.bc2)), 0, 1)
+    t_ab, t_ac, t_bc = np.where(np.isnan(t), 0, t)
+
+    candidates = np.stack((tri.a + tri.ab * t_ab[:, None], tri.a + tri.ac * t_ac[:, None],
+                           tri.b + tri.bc * t_bc[:, None]))
+    nearest = np.argmin(dot(candidates - p, candidates - p), axis=0)
+    on_edge = candidates[nearest, np.arange(len(tri))]
+    face = tri.a + tri.ab * v[:, None] + tri.ac * w[:, None]
+    return np.where(inside[:, None], face, on_edge)
+
+
+def segment_segments(p1, q1, p2, d2, eps=1e-12):
+    # distances between segments p1q1 and a batch p2 + [0, 1] d2, Ericson 5.1.9
+    d1, r = q1 - p1, p1 - p2
+    a, e = dot(d1, d1), dot(d2, d2)
+    b, c, f = dot(d2, d1), dot(r, d1), dot(d2, r)
+    denom = a * e - b * b
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        s = np.where(denom > eps, np.clip((b * f - c * e) / denom, 0, 1), 0)
+        t = np.where(e > eps, (b * s + f) / e, 0)
+        s = np.where(t < 0, np.clip(-c / a, 0, 1), np.where(t > 1, np.clip((b - c) / a, 0, 1), s))
+    s = np.where(a > eps, s, 0)
+    t = np.clip(t, 0, 1)
+    return norm(p1 + s[:, None] * d1 - (p2 + d2 * t[:, None]))
+
+
+def segment_triangles(p, q, tri):
+    # exact segment/triangle distance: zero when the segment pierces the triangle, otherwise the
+    # closest pair has an endpoint over the face or lies on a triangle edge
+    m = len(tri)
+    pq = q - p
+    ends = np.concatenate((np.broadcast_to(p, (m, 3)), np.broadcast_to(q, (m, 3))))
+    face = Triangles.__new__(Triangles)
+    face.data = np.concatenate((tri.data, tri.data))
+    _, _, inside, _, _ = barycentric(ends - face.a, face)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        height = np.abs(dot(ends - face.a, face.normal)) / np.sqrt(dot(face.normal, face.normal))
+    over_face = np.where(inside, height, np.inf).reshape(2, m).min(axis=0)
+
+    starts = np.concatenate((tri.a, tri.a, tri.b))
+    edges = np.concatenate((tri.ab, tri.ac, tri.bc))
+    on_edge = segment_segments(np.tile(np.broadcast_to(p, (m, 3)), (3, 1)), np.tile(np.broadcast_to(q, (m, 3)), (3, 1)),
+                               starts, edges).reshape(3, m).min(axis=0)
+
+    d = np.minimum(over_face, on_edge)
+    return np.where(ray_triangles(p, pq, tri) <= 1, 0, d)
@@ -1,27 +1,15 @@
+import ctypes
+
 import numpy as np
 import pyglet
 from pyglet.gl import *
 import pyglet.gl as gl
 
 from object import Object
-from bspline import Bspline
+from bspline import Bspline, bspline_approximation, bspline_tangent
 
 window = pyglet.window.Window(1024, 768)
 
-def bspline_approximation(bspline, t, i):
-    T_3 = np.array([t ** 3, t ** 2, t, 1])
-    B_i3 = 1 / 6 * np.array([[-1, 3, -3, 1], [3, -6, 3, 0], [-3, 0, 3, 0], [1, 4, 1, 0]])
-    R_i = np.array([bspline.vertices[i - 1], bspline.vertices[i], bspline.vertices[i + 1], bspline.vertices[i + 2]])
-    return T_3 @ B_i3 @ R_i
-
-
-def bspline_tangent(bspline, t, i):
-    T_2 = np.array([t ** 2, t, 1])
-    B_i3 = 0.5 * np.array([[-1, 3, -3, 1], [2, -4, 2, 0], [-1, 0, 1, 0]])
-    R_i = np.array([bspline.vertices[i - 1], bspline.vertices[i], bspline.vertices[i + 1], bspline.vertices[i + 2]])
-    return T_2 @ B_i3 @ R_i
-
-
 def rotation(start, end):
     ax = np.cross(start, end)
     cos_theta = (start @ end) / (np.linalg.norm(start) * np.linalg.norm(end))
@@ -29,17 +17,67 @@ def rotation(start, end):
     return ax, theta
 
 
+def rotation_matrix(axis, theta):
+    # the matrix glRotatef(theta, *axis) multiplies with
+    norm = np.linalg.norm(axis)
+    if norm == 0:
+        return np.eye(3)
+    x, y, z = axis / norm
+    K = np.array([[0, -z, y], [z, 0, -x], [-y, x, 0]])
+    theta = np.deg2rad(theta)
+    return np.eye(3) + np.sin(theta) * K + (1 - np.cos(theta)) * K @ K
+
+
+def to_object_frame(points, bspline, t, i):
+    # undoes what on_draw does to the object: translate to the path point, scale 1/6, rotate
+    position = bspline_approximation(bspline, t, i) / bspline.scale
+    axis, theta = rotation(np.array([0, 0, 1]), bspline_tangent(bspline, t, i))
+    R = rotation_matrix(axis, theta)
+    # rows are points, so p @ R is R^T p
+    return 6 * (np.asarray(points) / bspline.scale - position) @ R
+
+
+class CurveBuffer:
+    # VBO holding Bspline.curve, only edited or shifted rows get uploaded again
+    def __init__(self):
+        self.vbo = gl.GLuint()
+        gl.glGenBuffers(1, ctypes.byref(self.vbo))
+        self.capacity = 0
+
+    def upload(self, curve, first, count):
+        data = curve[first:first + count]
+        gl.glBufferSubData(gl.GL_ARRAY_BUFFER, first * curve.itemsize * 3, data.nbytes,
+                           data.ctypes.data_as(ctypes.c_void_p))
+
+    def sync(self, bspline):
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vbo)
+        curve = bspline.curve
+        dirty_from, dirty = bspline.take_dirty()
+
+        if len(curve) > self.capacity:
+            # room to grow, so inserts don't reallocate every time
+            self.capacity = 2 * len(curve)
+            gl.glBufferData(gl.GL_ARRAY_BUFFER, self.capacity * curve.itemsize * 3, None, gl.GL_DYNAMIC_DRAW)
+            dirty_from = 0
+
+        if dirty_from is not None:
+            self.upload(curve, dirty_from, len(curve) - dirty_from)
+        for i in dirty:
+            if dirty_from is None or i * bspline.block + bspline.block <= dirty_from:
+                self.upload(curve, i * bspline.block, bspline.block)
+
+
 def draw_curve(bspline):
-    gl.glBegin(gl.GL_LINES)
-    for i in range(len(bspline.vertices) - 2):
-        for t in np.arange(0, 1, 0.05):
-            p_i = bspline_approximation(bspline, t, i)
-            dp_i = bspline_tangent(bspline, t, i) / bspline.scale
-            p_i /= bspline.scale
-            gl.glVertex3f(*p_i)
-            p_i += dp_i
-            gl.glVertex3f(*p_i)
-    gl.glEnd()
+    # segments are evaluated by Bspline only when their control points change
+    curve_buffer.sync(bspline)
+    gl.glPushMatrix()
+    gl.glScalef(1 / bspline.scale, 1 / bspline.scale, 1 / bspline.scale)
+    gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
+    gl.glVertexPointer(3, gl.GL_FLOAT, 0, 0)
+    gl.glDrawArrays(gl.GL_LINES, 0, len(bspline.curve))
+    gl.glDisableClientState(gl.GL_VERTEX_ARRAY)
+    gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+    gl.glPopMatrix()
 
 
 def draw_object(object):
@@ -49,6 +87,50 @@ def draw_object(object):
             gl.glVertex3f(*object.vertices[vertex_id - 1])
     gl.glEnd()
 
+    if picked is not None:
+        gl.glColor3f(1, 0.2, 0.2)
+        gl.glPolygonMode(gl.GL_FRONT_AND_BACK, gl.GL_FILL)
+        gl.glBegin(gl.GL_TRIANGLES)
+        for vertex_id in object.polygons[picked]:
+            gl.glVertex3f(*object.vertices[vertex_id - 1])
+        gl.glEnd()
+        gl.glPolygonMode(gl.GL_FRONT_AND_BACK, gl.GL_LINE)
+        gl.glColor3f(1, 1, 1)
+
+
+def save_matrices():
+    # matrices the object was drawn with, so mouse rays land in object space
+    gl.glGetDoublev(gl.GL_MODELVIEW_MATRIX, modelview)
+    gl.glGetDoublev(gl.GL_PROJECTION_MATRIX, projection)
+    gl.glGetIntegerv(gl.GL_VIEWPORT, viewport)
+
+
+def unproject(x, y, z):
+    ox, oy, oz = gl.GLdouble(), gl.GLdouble(), gl.GLdouble()
+    gl.glu.gluUnProject(x, y, z, modelview, projection, viewport, ctypes.byref(ox), ctypes.byref(oy), ctypes.byref(oz))
+    return np.array([ox.value, oy.value, oz.value])
+
+
+@window.event
+def on_mouse_press(x, y, button, modifiers):
+    global picked
+    near = unproject(x, y, 0)
+    far = unproject(x, y, 1)
+    hit = o.bvh.intersect(near, far - near)
+    picked = hit[1] if hit else None
+
+
+@window.event
+def on_key_press(symbol, modifiers):
+    if symbol == pyglet.window.key.C:
+        # how close the path passes to the object at its current position
+        hit = o.bvh.clearance(to_object_frame(spline_object.path(), spline_object, t, i))
+        if hit:
+            d, segment, polygon = hit
+            clearance_label.text = f"clearance {d / 6:.4f} (path segment {segment}, polygon {polygon})"
+        else:
+            clearance_label.text = ""
+
 
 def update(x, dt):
     global t, i
@@ -62,6 +144,13 @@ def update(x, dt):
         i = 0
 
 
+def reload_spline(dt):
+    global i
+    # hot reload of bspline.txt, the path can get shorter under the object
+    if spline_object.reload() and i >= (len(spline_object.vertices) - 2):
+        i = 0
+
+
 def set_parameters():
     gl.glPolygonMode(gl.GL_FRONT_AND_BACK, gl.GL_LINE)
     gl.glMatrixMode(gl.GL_PROJECTION)
@@ -73,6 +162,17 @@ def set_parameters():
     gl.glLoadIdentity()
 
 
+def draw_overlay():
+    # window pixel coordinates and filled glyphs, set_parameters puts the 3D state back next frame
+    gl.glPolygonMode(gl.GL_FRONT_AND_BACK, gl.GL_FILL)
+    gl.glMatrixMode(gl.GL_PROJECTION)
+    gl.glLoadIdentity()
+    gl.glOrtho(0, window.width, 0, window.height, -1, 1)
+    gl.glMatrixMode(gl.GL_MODELVIEW)
+    gl.glLoadIdentity()
+    clearance_label.draw()
+
+
 @window.event
 def on_draw():
     set_parameters()
@@ -87,16 +187,26 @@ def on_draw():
     gl.glTranslatef(*bspline_vertex)
     gl.glScalef(1 / 6, 1 / 6, 1 / 6)
     gl.glRotatef(theta, *axis)
-    
+    save_matrices()
 
     draw_object(o)
 
+    if clearance_label.text:
+        draw_overlay()
+
 
 if __name__ == "__main__":
     t, i = 0, 0
+    picked = None
+    modelview = (gl.GLdouble * 16)()
+    projection = (gl.GLdouble * 16)()
+    viewport = (gl.GLint * 4)()
 
     spline_object = Bspline('bspline.txt')
+    curve_buffer = CurveBuffer()
+    clearance_label = pyglet.text.Label("", x=10, y=10)
     o = Object('objects/bird.obj')
 
     pyglet.clock.schedule(update, 1)
+    pyglet.clock.schedule_interval(reload_spline, 0.5)
     pyglet.app.run()
@@ -1,8 +1,10 @@
 from utils import *
+from bvh import BVH
 
 class Object:
     vertices = []
     polygons = []
+    bvh = None
 
     def __init__(self, file):
         vertices, xyz = load_vertices(file)
@@ -16,3 +18,5 @@ class Object:
         polygons = load_polygons(file)
         self.vertices = vertices
         self.polygons = polygons
+        # built once per load, used for picking and clearance queries
+        self.bvh = BVH(vertices, polygons)
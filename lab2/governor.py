@@ -0,0 +1,32 @@
+from collections import deque
+
+class QualityGovernor:
+    # ista klasa je i u lab3/governor.py, mijenjati obje kopije zajedno
+    def __init__(self, target_ms=1000 / 60, min_quality=0.25, max_quality=1.0, step=0.1, hysteresis=0.15, window=30):
+        self.target_ms = target_ms
+        self.min_quality = min_quality
+        self.max_quality = max_quality
+        self.step = step
+        self.hysteresis = hysteresis
+        self.samples = deque(maxlen=window)
+        self.quality = max_quality
+
+    def update(self, frame_ms):
+        self.samples.append(frame_ms)
+        # odluka tek kad je prozor uzoraka pun
+        if len(self.samples) < self.samples.maxlen:
+            return self.quality
+
+        avg = sum(self.samples) / len(self.samples)
+        old_quality = self.quality
+
+        # histereza: mijenjamo kvalitetu samo izvan pojasa oko ciljanog vremena
+        if avg > self.target_ms * (1 + self.hysteresis):
+            self.quality = max(self.min_quality, self.quality - self.step)
+        elif avg < self.target_ms * (1 - self.hysteresis):
+            self.quality = min(self.max_quality, self.quality + self.step)
+
+        # nakon promjene mjerimo ispočetka
+        if self.quality != old_quality:
+            self.samples.clear()
+        return self.quality
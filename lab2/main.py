@@ -1,5 +1,6 @@
 import pygame
 from rainsystem import RainSystem
+from governor import QualityGovernor
 from constants import *
 
 def main():
@@ -9,6 +10,7 @@ def main():
 
     system = RainSystem(pygame.image.load("drop.png"))
     clock = pygame.time.Clock()
+    governor = QualityGovernor()
 
     mouse_pos = (WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2)
     mouse_pressed = False
@@ -26,6 +28,7 @@ def main():
                 mouse_pressed = False
 
         dt = clock.get_time() / 1000.0
+        system.quality = governor.update(clock.get_rawtime())
 
         window.fill((20, 20, 20))
         system.update(dt, mouse_pos, mouse_pressed)
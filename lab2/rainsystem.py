@@ -20,6 +20,9 @@ class RainSystem:
         self.base_dy = (-150, -300)
         self.fast_dy = (-300, -500)
 
+        # faktor kvalitete koji postavlja QualityGovernor
+        self.quality = 1.0
+
     def update(self, dt, mouse_pos, mouse_pressed=False):
         # vjetar
         wind = (mouse_pos[0] - WINDOW_WIDTH / 2) / (WINDOW_WIDTH / 2)
@@ -35,7 +38,7 @@ class RainSystem:
             dy_range = self.base_dy
 
         # kontinuirano emitiranje
-        self.spawn_accumulator += spawn_rate * dt
+        self.spawn_accumulator += spawn_rate * self.quality * dt
         while self.spawn_accumulator >= 1:
             self.spawn_accumulator -= 1
             self.add_new_drop(rain_dx, random.uniform(*dy_range))
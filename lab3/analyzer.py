@@ -0,0 +1,287 @@
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import argparse
+import math
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import pygame
+from shape_shifter import GRAVITY, SHAPE_PROPS, Player, Shape, StarStore, get_levels
+
+# headless reachability check of the levels from get_levels():
+# BFS over discretized player states, every step holds one input for a few frames.
+# States in the same position/fall speed cell count as one, so UNREACHABLE means
+# unreachable on that grid; a smaller --cell/--vel-cell/--hold checks finer moves.
+# Only moving platforms within a step's reach add their --phases bucket to a state,
+# and in the air a shape switch is only tried towards the circle
+#
+#   python lab3/analyzer.py            all levels
+#   python lab3/analyzer.py 2 -w 8     level 2 on 8 processes
+
+MOVE_KEYS = {-1: pygame.K_LEFT, 1: pygame.K_RIGHT}
+SHAPE_KEYS = {Shape.SQUARE: "1", Shape.CIRCLE: "2", Shape.TRIANGLE: "3"}
+MAX_SPEED = max(p.speed for p in SHAPE_PROPS.values())
+MAX_JUMP = max(p.jump_power for p in SHAPE_PROPS.values())
+MAX_SIZE = max(p.size for p in SHAPE_PROPS.values())
+
+# worker globals, set once per process by init_worker
+level = None
+settings = None
+
+
+class Settings:
+    def __init__(self, hold=12, cell=32, vel_cell=6, phases=2, shapes=tuple(Shape)):
+        self.hold = hold
+        self.cell = cell
+        self.vel_cell = vel_cell
+        self.phases = phases
+        self.shapes = shapes
+
+
+def init_worker(level_idx, worker_settings):
+    global level, settings
+    level = get_levels()[level_idx]
+    level.stars = StarStore(level.star_positions)
+    settings = worker_settings
+
+
+def capture(player, frame):
+    riding = player.riding_platform.i if player.riding_platform else -1
+    return (player.x, player.y, player.vel_y, player.on_ground, riding,
+            player.shape, player.target_shape, player.morph_t, frame)
+
+
+def restore(state):
+    x, y, vel_y, on_ground, riding, shape, target_shape, morph_t, frame = state
+    player = Player(x, y)
+    player.vel_y = vel_y
+    player.on_ground = on_ground
+    player.riding_platform = level.platforms.views[riding] if riding >= 0 else None
+    player.shape = shape
+    player.target_shape = target_shape
+    player.morph_t = morph_t
+    # particles only cost time here
+    player.jump_particles = 0
+    return player
+
+
+def reach(state, s):
+    # box the player can get to within one step
+    x, y, vel_y = state[0], state[1], state[2]
+    dx = MAX_SPEED * s.hold + MAX_SIZE
+    dy = (abs(vel_y) + MAX_JUMP) * s.hold + GRAVITY * s.hold * (s.hold + 1) / 2 + MAX_SIZE
+    return pygame.Rect(int(x - dx), int(y - dy), int(2 * dx) + 1, int(2 * dy) + 1)
+
+
+def state_key(state, lvl, s):
+    # platforms have to be where they are at the state's frame (seek)
+    x, y, vel_y, on_ground, riding, shape, target_shape, morph_t, frame = state
+    # moving platforms make time part of the state, bucketed by their phase; only the ones
+    # within reach of the next step (and the ridden one) can change what happens next
+    store = lvl.platforms
+    near = {p.i for p in store.near(reach(state, s))} | {riding}
+    phase = tuple((i, int((store.t0[i] + store.speed[i] * frame) % (2 * math.pi) / (2 * math.pi) * s.phases))
+                  for i in store.moving.tolist() if i in near)
+    return (int(x // s.cell), int(y // s.cell), int(vel_y // s.vel_cell), on_ground, riding,
+            shape, target_shape, min(morph_t, 1) >= 1, phase)
+
+
+def actions(state):
+    on_ground, shape_now, target_shape = state[3], state[5], state[6]
+    for move in (-1, 0, 1):
+        yield move, False, None
+        if on_ground: yield move, True, None
+    # a switch only once the last morph is done (switching mid-morph just restarts it),
+    # and folded into the moves: standing still while morphing is the same as walking into a wall.
+    # In the air the jump is already spent, so only the circle (fastest and smallest) can help
+    if shape_now != target_shape: return
+    for shape in settings.shapes:
+        if shape != target_shape and (on_ground or shape == Shape.CIRCLE):
+            for move in (-1, 1):
+                yield move, False, shape
+
+
+def simulate(batch):
+    # steps every action from every state side by side, so the platforms get seeked once per frame;
+    # a BFS layer is all on one frame. Returns (node, action, state after the step or None when
+    # the player died or finished, events)
+    runs = []
+    for node, state in batch:
+        for action in actions(state):
+            move, jump, shape = action
+            player = restore(state)
+            if shape is not None: player.change_shape(shape)
+            keys = defaultdict(bool)
+            if move: keys[MOVE_KEYS[move]] = True
+            runs.append([node, action, player, keys, set(), True])
+
+    frame = batch[0][1][-1]
+    for f in range(settings.hold):
+        frame += 1
+        level.platforms.seek(frame)
+
+        for run in runs:
+            node, action, player, keys, events, running = run
+            if not running: continue
+            keys[pygame.K_SPACE] = action[1] and f == 0
+
+            alive = player.update(level.platforms, keys)
+            rect = player.get_rect()
+            if not alive or level.spikes.hit(rect):
+                run[2] = run[5] = None
+                continue
+
+            for i in rect.collidelistall(level.stars.rects):
+                events.add(("star", i))
+            if player.riding_platform: events.add(("platform", player.riding_platform.i))
+            if rect.colliderect(level.finish_rect):
+                events.add(("finish",))
+                run[2] = run[5] = None
+
+    return [(node, action, capture(player, frame) if player else None, events)
+            for node, action, player, keys, events, _ in runs]
+
+
+def expand(batch):
+    # keys are made here, where the platforms sit at the children's frame, and a child whose
+    # key already came up in this batch is dropped before it gets sent back
+    results = []
+    seen = set()
+    for node, action, child, events in simulate(batch):
+        key = state_key(child, level, settings) if child else None
+        if key in seen:
+            child = key = None
+        if key is not None:
+            seen.add(key)
+        if child or events:
+            results.append((node, action, child, key, events))
+    return results
+
+
+def format_path(nodes, node):
+    steps = []
+    while node is not None:
+        parent, action = nodes[node]
+        if action is not None:
+            move, jump, shape = action
+            steps.append("LSR"[move + 1] + ("J" if jump else "") + (SHAPE_KEYS[shape] if shape else ""))
+        node = parent
+    return " ".join(reversed(steps))
+
+
+def analyze(level_idx, workers=None, max_steps=200, s=None, exhaustive=False):
+    s = s or Settings()
+    init_worker(level_idx, s)
+    lvl = level
+
+    start = restore((*lvl.start_pos, 0, False, -1, Shape.SQUARE, Shape.SQUARE, 1.0, 0))
+    start_state = capture(start, 0)
+    lvl.platforms.seek(0)
+
+    # nodes[i] = (parent node, action), only kept for states and first events
+    nodes = [(None, None)]
+    visited = {state_key(start_state, lvl, s)}
+    frontier = [(0, start_state)]
+    first = {}
+    goals = {("finish",)} | {("star", i) for i in range(len(lvl.star_positions))}
+
+    workers = workers or os.cpu_count()
+    chunks = 4 * workers
+    # a single worker runs in this process, nothing to gain from pickling every batch
+    pool = ProcessPoolExecutor(workers, initializer=init_worker, initargs=(level_idx, s)) if workers > 1 else None
+    run = pool.map if pool else map
+    try:
+        for step in range(max_steps):
+            if not frontier: break
+            batches = [frontier[i::chunks] for i in range(chunks) if frontier[i::chunks]]
+
+            next_frontier = []
+            for results in run(expand, batches):
+                for parent, action, child, key, events in results:
+                    new_events = events - first.keys()
+                    is_new = key is not None and key not in visited
+                    if not (new_events or is_new): continue
+
+                    node = len(nodes)
+                    nodes.append((parent, action))
+                    for e in new_events: first[e] = (node, step + 1)
+                    if is_new:
+                        visited.add(key)
+                        next_frontier.append((node, child))
+            frontier = next_frontier
+
+            # everything found, only a full search can tell about the platforms
+            if not exhaustive and goals <= first.keys(): break
+    finally:
+        if pool: pool.shutdown()
+
+    return {
+        "states": len(visited),
+        "max_steps": max_steps,
+        "exhausted": not frontier,
+        "finish": first.get(("finish",)),
+        "stars": [first.get(("star", i)) for i in range(len(lvl.star_positions))],
+        "platforms": [first.get(("platform", i)) for i in range(len(lvl.platforms))],
+        "nodes": nodes,
+    }
+
+
+def report(level_idx, result, elapsed, s):
+    lvl = get_levels()[level_idx]
+    nodes = result["nodes"]
+    print(f"Level {level_idx + 1}: {result['states']} states in {elapsed:.1f} s")
+
+    missing = []
+
+    def line(name, hit):
+        if hit is None and result["exhausted"]:
+            missing.append(name)
+            print(f"  {name}: UNREACHABLE*")
+        elif hit is None:
+            print(f"  {name}: not found within {result['max_steps']} steps")
+        else:
+            node, steps = hit
+            print(f"  {name}: {steps} steps ({steps * s.hold} frames)  {format_path(nodes, node)}")
+
+    line("finish", result["finish"])
+    for i, hit in enumerate(result["stars"]):
+        line(f"star {i + 1} {tuple(lvl.star_positions[i])}", hit)
+
+    # platforms nobody can land on point at jumps that can't be made
+    if result["exhausted"]:
+        for i, hit in enumerate(result["platforms"]):
+            if hit is None:
+                r = lvl.platforms.rects[i]
+                missing.append(i)
+                print(f"  never landed on platform {(r.x, r.y, r.w, r.h)}*")
+
+    if missing:
+        print(f"  * on a {s.cell} px, {s.vel_cell} px/frame grid, a move needing finer aim can be missed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless reachability check of SHAPE SHIFTER levels")
+    parser.add_argument("levels", nargs="*", type=int, help="level numbers, all by default")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="processes, CPU count by default")
+    parser.add_argument("--hold", type=int, default=12, help="frames each input is held")
+    parser.add_argument("--cell", type=int, default=32, help="position grid in pixels")
+    parser.add_argument("--vel-cell", type=int, default=6, help="fall speed grid in pixels per frame")
+    parser.add_argument("--phases", type=int, default=2, help="buckets per moving platform cycle")
+    parser.add_argument("--max-steps", type=int, default=200)
+    parser.add_argument("--shapes", default="123", help="allowed shapes, e.g. 13 for square and triangle")
+    parser.add_argument("--exhaustive", action="store_true", help="keep searching after every goal is found")
+    args = parser.parse_args()
+
+    shapes = tuple(shape for shape, key in SHAPE_KEYS.items() if key in args.shapes)
+    s = Settings(hold=args.hold, cell=args.cell, vel_cell=args.vel_cell, phases=args.phases, shapes=shapes)
+    levels = [n - 1 for n in args.levels] or range(len(get_levels()))
+    for level_idx in levels:
+        start = time.time()
+        result = analyze(level_idx, args.workers, args.max_steps, s, args.exhaustive)
+        report(level_idx, result, time.time() - start, s)
+
+
+if __name__ == "__main__":
+    main()
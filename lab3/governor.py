@@ -0,0 +1,50 @@
+from collections import deque
+
+class QualityGovernor:
+    # mirrored in lab2/governor.py, change both copies together
+    def __init__(self, target_ms=1000 / 60, min_quality=0.25, max_quality=1.0, step=0.1, hysteresis=0.15, window=30):
+        self.target_ms = target_ms
+        self.min_quality = min_quality
+        self.max_quality = max_quality
+        self.step = step
+        self.hysteresis = hysteresis
+        self.samples = deque(maxlen=window)
+        self.quality = max_quality
+
+    def update(self, frame_ms):
+        self.samples.append(frame_ms)
+        # only decide once the sample window is full
+        if len(self.samples) < self.samples.maxlen:
+            return self.quality
+
+        avg = sum(self.samples) / len(self.samples)
+        old_quality = self.quality
+
+        # hysteresis band around the target, inside it nothing changes
+        if avg > self.target_ms * (1 + self.hysteresis):
+            self.quality = max(self.min_quality, self.quality - self.step)
+        elif avg < self.target_ms * (1 - self.hysteresis):
+            self.quality = min(self.max_quality, self.quality + self.step)
+
+        # start measuring again after every change
+        if self.quality != old_quality:
+            self.samples.clear()
+        return self.quality
+
+
+class EffectsGovernor(QualityGovernor):
+    # lab3 knobs on top of the shared quality factor
+
+    def scale(self, value):
+        return max(1, int(round(value * self.quality)))
+
+    @property
+    def smooth(self):
+        return self.quality >= 0.75
+
+    @property
+    def star_angle_step(self):
+        # 0 means exact rotation every frame
+        if self.quality >= 0.75: return 0
+        if self.quality >= 0.5: return 10
+        return 30
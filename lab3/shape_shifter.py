@@ -2,16 +2,21 @@ import pygame
 import sys
 import math
 import random
+import numpy as np
 from enum import Enum
 from dataclasses import dataclass
 from typing import Tuple, List
 
+from governor import EffectsGovernor
+
 pygame.init()
 
 SCREEN_WIDTH = 1100
 SCREEN_HEIGHT = 700
 FPS = 60
 GRAVITY = 0.5
+MAX_CONTACTS = 4
+SWEEP_EPS = 1e-6
 
 
 class Shape(Enum):
@@ -33,6 +38,29 @@ SHAPE_PROPS = {
 }
 
 
+class TextCache:
+    def __init__(self):
+        self.texts = {}
+        self.layers = {}
+
+    def render(self, font, text, color):
+        # rasterize only the first time this (font, text, color) is asked for
+        key = (font, text, color)
+        surf = self.texts.get(key)
+        if surf is None:
+            surf = font.render(text, True, color)
+            self.texts[key] = surf
+        return surf
+
+    def layer(self, key, build):
+        # whole static screens, composited once by build()
+        surf = self.layers.get(key)
+        if surf is None:
+            surf = build()
+            self.layers[key] = surf
+        return surf
+
+
 class Particle:
     def __init__(self, pos, vel, radius, color, life):
         self.x, self.y = pos
@@ -42,11 +70,12 @@ class Particle:
         self.life = life
         self.max_life = life
 
-    def update(self):
-        self.vy += 0.3
-        self.x += self.vx
-        self.y += self.vy
-        self.life -= 1
+    def update(self, dt=1):
+        # same path as dt single frames, velocity is added before moving
+        self.x += self.vx * dt
+        self.y += self.vy * dt + 0.3 * dt * (dt + 1) / 2
+        self.vy += 0.3 * dt
+        self.life -= dt
 
     def draw(self, screen, cam_x):
         alpha = int(255 * (self.life / self.max_life))
@@ -102,25 +131,6 @@ class MovingPlatform(Platform):
         self.delta_y = self.rect.y - old_y
 
 
-class Star:
-    def __init__(self, x, y):
-        self.rect = pygame.Rect(x, y, 25, 25)
-        self.collected = False
-        self.angle = 0
-
-    def draw(self, screen, cam_x, star_surface): 
-        if not self.collected:
-            self.angle += 0.05
-            # floating effect
-            offset_y = math.sin(self.angle * 2) * 8 
-            
-            # rotation effect
-            rotated_star = pygame.transform.rotate(star_surface, self.angle * 50)
-            rect = rotated_star.get_rect(center=(self.rect.centerx - cam_x, self.rect.centery + offset_y))
-            
-            screen.blit(rotated_star, rect.topleft)
-
-
 class Spike:
     def __init__(self, x, y, width=40, height=30, flipped=False):
         self.rect = pygame.Rect(x, y, width, height)
@@ -147,6 +157,235 @@ class Spike:
         pygame.draw.polygon(screen, (200, 0, 0), points, 2)
 
 
+def rect_round(values):
+    # same rounding pygame.Rect does on float assignment, halves away from zero
+    return np.sign(values) * np.floor(np.abs(values) + 0.5)
+
+
+class PlatformStore:
+    # every platform of a level as one row in flat arrays
+    def __init__(self, platforms):
+        self.x = np.array([p.rect.x for p in platforms], dtype=np.int64)
+        self.y = np.array([p.rect.y for p in platforms], dtype=np.int64)
+        self.delta_x = np.zeros(len(platforms), dtype=np.int64)
+        self.delta_y = np.zeros(len(platforms), dtype=np.int64)
+        # plain int copies for the per-platform collision code, numpy scalars are slow there
+        self.dx = [0] * len(platforms)
+        self.dy = [0] * len(platforms)
+        self.reach = 0
+
+        # motion parameters, static platforms just keep amp 0 and speed 0
+        moving = [isinstance(p, MovingPlatform) for p in platforms]
+        self.base_x = np.array([p.base_x if m else p.rect.x for p, m in zip(platforms, moving)], dtype=float)
+        self.base_y = np.array([p.base_y if m else p.rect.y for p, m in zip(platforms, moving)], dtype=float)
+        self.axis_x = np.array([m and p.axis == "x" for p, m in zip(platforms, moving)])
+        self.amp = np.array([p.amp if m else 0 for p, m in zip(platforms, moving)], dtype=float)
+        self.speed = np.array([p.speed if m else 0 for p, m in zip(platforms, moving)], dtype=float)
+        self.t = np.array([p.t if m else 0 for p, m in zip(platforms, moving)], dtype=float)
+        self.t0 = self.t.copy()
+        self.moving = np.flatnonzero(moving)
+
+        # pygame rects stay around for collision code, only moving ones get synced
+        self.rects = [p.rect.copy() for p in platforms]
+        self.colors = [p.color for p in platforms]
+        self.views = [PlatformView(self, i) for i in range(len(platforms))]
+
+    def __len__(self):
+        return len(self.views)
+
+    def __iter__(self):
+        return iter(self.views)
+
+    def update(self, dt=1):
+        # dt frames at once, the deltas cover the whole step
+        m = self.moving
+        self.delta_x[:] = 0
+        self.delta_y[:] = 0
+        if not len(m): return
+
+        self.t[m] += self.speed[m] * dt
+        offset = np.sin(self.t[m]) * self.amp[m]
+        along_x = self.axis_x[m]
+        new_x = np.where(along_x, rect_round(self.base_x[m] + offset), self.x[m]).astype(np.int64)
+        new_y = np.where(along_x, self.y[m], rect_round(self.base_y[m] + offset)).astype(np.int64)
+
+        self.delta_x[m] = new_x - self.x[m]
+        self.delta_y[m] = new_y - self.y[m]
+        self.x[m] = new_x
+        self.y[m] = new_y
+        self.dx = self.delta_x.tolist()
+        self.dy = self.delta_y.tolist()
+        self.reach = max(max(map(abs, self.dx)), max(map(abs, self.dy)))
+
+        for i, x, y in zip(m.tolist(), new_x.tolist(), new_y.tolist()):
+            self.rects[i].x = x
+            self.rects[i].y = y
+
+    def near(self, rect):
+        # platforms that can touch rect this frame; rects are where the platforms end up,
+        # so widen by the motion once for where they started and once for riding along after a contact
+        grow = 4 * self.reach + 2
+        return [self.views[i] for i in rect.inflate(grow, grow).collidelistall(self.rects)]
+
+    def seek(self, frame):
+        # put every platform where it is after `frame` updates, deltas included
+        m = self.moving
+        if not len(m): return
+
+        self.t[m] = self.t0[m] + self.speed[m] * (frame - 1)
+        offset = np.sin(self.t[m]) * self.amp[m]
+        along_x = self.axis_x[m]
+        self.x[m] = np.where(along_x, rect_round(self.base_x[m] + offset), self.x[m])
+        self.y[m] = np.where(along_x, self.y[m], rect_round(self.base_y[m] + offset))
+        self.update()
+
+
+class PlatformView:
+    __slots__ = ("store", "i")
+
+    def __init__(self, store, i):
+        self.store = store
+        self.i = i
+
+    @property
+    def rect(self):
+        return self.store.rects[self.i]
+
+    @property
+    def color(self):
+        return self.store.colors[self.i]
+
+    @property
+    def delta_x(self):
+        return self.store.dx[self.i]
+
+    @property
+    def delta_y(self):
+        return self.store.dy[self.i]
+
+    @property
+    def t(self):
+        return float(self.store.t[self.i])
+
+    draw = Platform.draw
+
+
+class StarStore:
+    rotation_cache = {}
+
+    def __init__(self, positions):
+        self.x = np.array([pos[0] for pos in positions], dtype=np.int64)
+        self.y = np.array([pos[1] for pos in positions], dtype=np.int64)
+        self.angle = np.zeros(len(positions))
+        self.offset_y = np.zeros(len(positions))
+        self.collected = np.zeros(len(positions), dtype=bool)
+        self.rects = [pygame.Rect(pos[0], pos[1], 25, 25) for pos in positions]
+        self.views = [StarView(self, i) for i in range(len(positions))]
+
+    def __len__(self):
+        return len(self.views)
+
+    def __iter__(self):
+        return iter(self.views)
+
+    def update(self):
+        # animation phases of all remaining stars in one go
+        live = ~self.collected
+        self.angle[live] += 0.05
+        # floating effect
+        self.offset_y[live] = np.sin(self.angle[live] * 2) * 8
+
+    def collect(self, rect):
+        # indices of stars the rect just touched
+        hit = (~self.collected & (self.x < rect.right) & (self.x + 25 > rect.left)
+               & (self.y < rect.bottom) & (self.y + 25 > rect.top))
+        self.collected |= hit
+        return np.flatnonzero(hit).tolist()
+
+
+class StarView:
+    __slots__ = ("store", "i")
+
+    def __init__(self, store, i):
+        self.store = store
+        self.i = i
+
+    @property
+    def rect(self):
+        return self.store.rects[self.i]
+
+    @property
+    def collected(self):
+        return bool(self.store.collected[self.i])
+
+    @collected.setter
+    def collected(self, value):
+        self.store.collected[self.i] = value
+
+    @property
+    def angle(self):
+        return float(self.store.angle[self.i])
+
+    def draw(self, screen, cam_x, star_surface, angle_step=0): 
+        if not self.collected:
+            offset_y = self.store.offset_y[self.i]
+            
+            # rotation effect
+            degrees = self.angle * 50
+            if angle_step:
+                # coarse angles are shared between stars and frames
+                key = (id(star_surface), int(degrees // angle_step) % (360 // angle_step))
+                rotated_star = StarStore.rotation_cache.get(key)
+                if rotated_star is None:
+                    rotated_star = pygame.transform.rotate(star_surface, key[1] * angle_step)
+                    StarStore.rotation_cache[key] = rotated_star
+            else:
+                rotated_star = pygame.transform.rotate(star_surface, degrees)
+            rect = rotated_star.get_rect(center=(self.rect.centerx - cam_x, self.rect.centery + offset_y))
+            
+            screen.blit(rotated_star, rect.topleft)
+
+
+class SpikeStore:
+    def __init__(self, spikes):
+        self.flipped = np.array([s.flipped for s in spikes], dtype=bool)
+        self.rects = [s.rect.copy() for s in spikes]
+        self.colors = [s.color for s in spikes]
+        self.views = [SpikeView(self, i) for i in range(len(spikes))]
+
+    def __len__(self):
+        return len(self.views)
+
+    def __iter__(self):
+        return iter(self.views)
+
+    def hit(self, rect):
+        # a handful of spikes, pygame's own loop beats numpy call overhead here
+        return rect.collidelist(self.rects) >= 0
+
+
+class SpikeView:
+    __slots__ = ("store", "i")
+
+    def __init__(self, store, i):
+        self.store = store
+        self.i = i
+
+    @property
+    def rect(self):
+        return self.store.rects[self.i]
+
+    @property
+    def color(self):
+        return self.store.colors[self.i]
+
+    @property
+    def flipped(self):
+        return bool(self.store.flipped[self.i])
+
+    draw = Spike.draw
+
+
 class Player:
     def __init__(self, x, y):
         self.x = x
@@ -162,6 +401,7 @@ class Player:
         self.on_ground = False
         self.riding_platform = None
         self.particles: List[Particle] = []
+        self.jump_particles = 12
 
     @property
     def props(self):
@@ -173,7 +413,7 @@ class Player:
             self.morph_t = 0
 
     def spawn_jump_particles(self):
-        for i in range(12):
+        for i in range(self.jump_particles):
             vx = random.uniform(-3, 3)
             vy = random.uniform(-6, -2)
             self.particles.append(Particle((self.x, self.y + self.props.size), (vx, vy), 4, self.props.color, 30))
@@ -182,20 +422,67 @@ class Player:
         size = self.props.size
         return pygame.Rect(self.x - size, self.y - size, size * 2, size * 2)
 
-    def update(self, platforms):
+    def sweep(self, platform, vx, vy, t0, size):
+        # time of impact against a platform between t0 and the end of the frame,
+        # returned as (toi, nx, ny) with the contact normal, or None
+        lag = 1 - t0
+        rect, dx, dy = platform.rect, platform.delta_x, platform.delta_y
+        rel_vx, rel_vy = vx - dx, vy - dy
+
+        # platform box where it is at t0, grown by the player size
+        left = rect.left - dx * lag - size
+        right = rect.right - dx * lag + size
+        top = rect.top - dy * lag - size
+        bottom = rect.bottom - dy * lag + size
+
+        # cheap reject, the relative motion never reaches the box
+        if max(self.x, self.x + rel_vx * lag) < left or min(self.x, self.x + rel_vx * lag) > right: return None
+        if max(self.y, self.y + rel_vy * lag) < top or min(self.y, self.y + rel_vy * lag) > bottom: return None
+
+        # already inside (shape grew or got pushed), leave along the shallowest side
+        if left + SWEEP_EPS < self.x < right - SWEEP_EPS and top + SWEEP_EPS < self.y < bottom - SWEEP_EPS:
+            _, nx, ny = min((self.y - top, 0, -1), (bottom - self.y, 0, 1),
+                            (self.x - left, -1, 0), (right - self.x, 1, 0))
+            return t0, nx, ny
+
+        entries, exits = [], []
+        for pos, lo, hi, rel_v in ((self.x, left, right, rel_vx), (self.y, top, bottom, rel_vy)):
+            if rel_v == 0:
+                if not lo + SWEEP_EPS < pos < hi - SWEEP_EPS: return None
+                entries.append(-math.inf)
+                exits.append(math.inf)
+            else:
+                t1, t2 = (lo - pos) / rel_v, (hi - pos) / rel_v
+                entries.append(min(t1, t2))
+                exits.append(max(t1, t2))
+
+        entry, exit_t = max(entries), min(exits)
+        if exit_t <= 0 or entry >= exit_t or entry > lag:
+            return None
+        entry = max(entry, 0)
+
+        # ties (corners) count as floor/ceiling contact
+        if entries[0] > entries[1]:
+            return t0 + entry, (-1 if rel_vx > 0 else 1), 0
+        return t0 + entry, 0, (-1 if rel_vy > 0 else 1)
+
+    def update(self, platforms, keys=None, dt=1):
+        # dt is the step length in frames, call platforms.update(dt) with the same dt first
         # morphing
         if self.morph_t < 1:
-            self.morph_t += self.morph_speed
+            self.morph_t += self.morph_speed * dt
             if self.morph_t >= 1: self.shape = self.target_shape
 
         # sync with moving platforms
+        carry_x = 0
         if self.on_ground and self.riding_platform:
-            self.x += self.riding_platform.delta_x * 2
-            self.y = self.riding_platform.rect.top - self.props.size
-            self.vel_y = 0 
+            # start the frame where the platform was and move with it
+            carry_x = self.riding_platform.delta_x
+            self.y = self.riding_platform.rect.top - self.riding_platform.delta_y - self.props.size
+            self.vel_y = self.riding_platform.delta_y / dt
 
-        # input and gravity
-        keys = pygame.key.get_pressed()
+        # input and gravity, keys can be passed in for headless runs
+        if keys is None: keys = pygame.key.get_pressed()
         self.vel_x = 0
         if keys[pygame.K_a] or keys[pygame.K_LEFT]: self.vel_x = -self.props.speed
         elif keys[pygame.K_d] or keys[pygame.K_RIGHT]: self.vel_x = self.props.speed
@@ -206,57 +493,82 @@ class Player:
             self.riding_platform = None
             self.spawn_jump_particles()
 
-        self.vel_y += GRAVITY
+        # exact displacement of dt frames of "add gravity, then move", so the path doesn't depend on dt
+        fall = self.vel_y * dt + GRAVITY * dt * (dt + 1) / 2
+        self.vel_y += GRAVITY * dt
 
-        # vertical resokution with squish check
-        self.y += self.vel_y
+        # swept resolution, always handle the earliest contact first
+        # vx, vy are displacements over the whole step, so any dt works without sub-steps
+        size = self.props.size
+        vx, vy = self.vel_x * dt + carry_x, fall
+        hit_y = False
+        t = 0.0
         self.on_ground = False
         self.riding_platform = None
-        
-        p_rect = self.get_rect()
-        for p in platforms:
-            if p_rect.colliderect(p.rect):
-                if self.vel_y >= 0: # landing/falling
-                    test_rect = pygame.Rect(p_rect.x, p.rect.top - (self.props.size * 2), p_rect.width, p_rect.height)
-                    is_squished = any(test_rect.colliderect(other.rect) for other in platforms if other != p)
-                    
-                    if is_squished:
-                        # instead of teleporting UP, push LEFT
-                        self.x -= (self.props.size * 2)
-                        # keep the Y where it was or stop it
-                        self.vel_y = 0
-                    else:
-                        self.y = p.rect.top - self.props.size
-                        self.vel_y = 0
-                        self.on_ground = True
-                        self.riding_platform = p
-                        
-                elif self.vel_y < 0: # hitting head
-                    self.y = p.rect.bottom + self.props.size
-                    self.vel_y = 0
-                p_rect = self.get_rect()
-
-        # horizontal resolution
-        self.x += self.vel_x
-        p_rect = self.get_rect()
-        for p in platforms:
-            if p_rect.colliderect(p.rect):
-                # ignore floor contact
-                if p_rect.bottom > p.rect.top + 3 and p_rect.top < p.rect.bottom - 3:
-                    if self.vel_x >= 0: # moving right or being pushed right
-                        self.x = p.rect.left - self.props.size
-                    elif self.vel_x < 0: # moving Left
-                        self.x = p.rect.right + self.props.size
-                    p_rect = self.get_rect()
+
+        # broad phase, only platforms near the swept box get the exact sweep
+        left, top = math.floor(min(self.x, self.x + vx)) - size, math.floor(min(self.y, self.y + vy)) - size
+        right, bottom = math.ceil(max(self.x, self.x + vx)) + size, math.ceil(max(self.y, self.y + vy)) + size
+        nearby = platforms.near(pygame.Rect(left, top, right - left, bottom - top))
+
+        for _ in range(MAX_CONTACTS):
+            hit = None
+            for p in nearby:
+                h = self.sweep(p, vx, vy, t, size)
+                if h and (hit is None or h[0] < hit[0]): hit = (*h, p)
+
+            if hit is None:
+                self.x += vx * (1 - t)
+                self.y += vy * (1 - t)
+                break
+
+            toi, nx, ny, p = hit
+            self.x += vx * (toi - t)
+            self.y += vy * (toi - t)
+            t = toi
+            lag = 1 - t
+
+            if ny == -1: # landing/falling
+                test_rect = pygame.Rect(self.x - size, p.rect.top - (size * 2), size * 2, size * 2)
+                is_squished = any(test_rect.colliderect(other.rect) for other in platforms if other != p)
+
+                if is_squished:
+                    # instead of teleporting UP, push LEFT
+                    self.x -= (size * 2)
+                    vy = 0
+                    hit_y = True
+                    break
+
+                self.y = p.rect.top - p.delta_y * lag - size
+                vy = p.delta_y
+                hit_y = True
+                self.on_ground = True
+                self.riding_platform = p
+
+            elif ny == 1: # hitting head
+                self.y = p.rect.bottom - p.delta_y * lag + size
+                vy = max(p.delta_y, 0)
+                hit_y = True
+
+            else: # walls and platforms pushing from the side
+                if nx == -1: self.x = p.rect.left - p.delta_x * lag - size
+                else: self.x = p.rect.right - p.delta_x * lag + size
+                vx = p.delta_x
+
+        if self.on_ground:
+            self.y = self.riding_platform.rect.top - size
+            vy = 0
+        # in free flight vel_y already is the end velocity, contacts replace it with the platform's
+        if hit_y: self.vel_y = vy / dt
 
         # particles
         for part in self.particles[:]:
-            part.update()
+            part.update(dt)
             if part.life <= 0: self.particles.remove(part)
 
         return self.y <= SCREEN_HEIGHT + 400
 
-    def draw(self, screen, cam_x, images):
+    def draw(self, screen, cam_x, images, smooth=True):
         # particles
         for p in self.particles: 
             p.draw(screen, cam_x)
@@ -269,7 +581,8 @@ class Player:
 
         # drawing
         current_raw_img = images[self.target_shape]
-        scaled_img = pygame.transform.smoothscale(current_raw_img, (size * 2, size * 2))
+        scale = pygame.transform.smoothscale if smooth else pygame.transform.scale
+        scaled_img = scale(current_raw_img, (size * 2, size * 2))
         screen.blit(scaled_img, (px - size, py - size))
 
         # eyes
@@ -292,12 +605,12 @@ class Player:
 
 class Level:
     def __init__(self, platforms, finish_rect, start_pos, star_positions, spikes=None):
-        self.platforms = platforms
+        self.platforms = PlatformStore(platforms)
         self.finish_rect = finish_rect
         self.start_pos = start_pos
         self.star_positions = star_positions
-        self.stars = []
-        self.spikes = spikes if spikes is not None else []
+        self.stars = StarStore([])
+        self.spikes = SpikeStore(spikes if spikes is not None else [])
 
 def get_levels():
     # PLATFORM - (x, y, w, h)
@@ -361,6 +674,8 @@ class Game:
         self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
         pygame.display.set_caption("SHAPE SHIFTER")
         self.clock = pygame.time.Clock()
+        self.governor = EffectsGovernor(1000 / FPS)
+        self.text_cache = TextCache()
         self.font = pygame.font.Font("lab3/Bad Coma.ttf", 64)
         self.stars_font = pygame.font.Font("lab3/Bad Coma.ttf", 48)
         self.title_font = pygame.font.Font("lab3/Bad Coma.ttf", 100)
@@ -388,14 +703,17 @@ class Game:
         }
 
     def draw_menu(self):
-        self.screen.blit(self.background, (0, 0))
+        self.screen.blit(self.text_cache.layer("MENU", self.build_menu), (0, 0))
+
+    def build_menu(self):
+        surf = self.background.copy()
         
         overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
         overlay.fill((0, 0, 0, 150)) 
-        self.screen.blit(overlay, (0, 0))
+        surf.blit(overlay, (0, 0))
         
-        title = self.title_font.render("SHAPE SHIFTER", True, (255, 255, 255))
-        self.screen.blit(title, (SCREEN_WIDTH//2 - title.get_width()//2, 150))
+        title = self.text_cache.render(self.title_font, "SHAPE SHIFTER", (255, 255, 255))
+        surf.blit(title, (SCREEN_WIDTH//2 - title.get_width()//2, 150))
         
         instructions = [
             "Instructions:",
@@ -409,13 +727,25 @@ class Game:
         
         for i, line in enumerate(instructions):
             color = (200, 200, 200) if "ENTER" not in line else (100, 255, 100)
-            text_surf = self.small_font.render(line, True, color)
-            self.screen.blit(text_surf, (SCREEN_WIDTH//2 - text_surf.get_width()//2, 280 + i * 40))
+            text_surf = self.text_cache.render(self.small_font, line, color)
+            surf.blit(text_surf, (SCREEN_WIDTH//2 - text_surf.get_width()//2, 280 + i * 40))
+        return surf
+
+    def build_win(self):
+        surf = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
+        surf.fill((0, 0, 0, 180))
+        win_txt = self.text_cache.render(self.font, "LEVEL COMPLETE!", (100, 255, 100))
+        score_txt = self.text_cache.render(self.stars_font, f"STARS: {self.final_score}", (255, 215, 0))
+        prompt = self.text_cache.render(self.small_font, "Press SPACE for Next Level", (255, 255, 255))
+        surf.blit(win_txt, (SCREEN_WIDTH//2 - win_txt.get_width()//2, 250))
+        surf.blit(score_txt, (SCREEN_WIDTH//2 - score_txt.get_width()//2, 310))
+        surf.blit(prompt, (SCREEN_WIDTH//2 - prompt.get_width()//2, 380))
+        return surf
 
     def reset_level(self):
         lvl = self.levels[self.current_level_idx]
         self.player = Player(lvl.start_pos[0], lvl.start_pos[1])
-        lvl.stars = [Star(pos[0], pos[1]) for pos in lvl.star_positions]
+        lvl.stars = StarStore(lvl.star_positions)
         self.collected_count = 0 
         self.cam_x = 0
         self.fade_alpha = 255
@@ -423,6 +753,8 @@ class Game:
     def run(self):
         while True:
             self.clock.tick(FPS)
+            # raw time excludes the tick delay, so it is the real frame cost
+            self.governor.update(self.clock.get_rawtime())
 
             if self.fade_alpha > 0:
                 self.fade_alpha -= 5
@@ -460,8 +792,9 @@ class Game:
             # UPDATES
             if self.state == "PLAYING":
                 lvl = self.levels[self.current_level_idx]
-                for p in lvl.platforms: p.update()
+                lvl.platforms.update()
                 
+                self.player.jump_particles = self.governor.scale(12)
                 alive = self.player.update(lvl.platforms)
                 if not alive: self.reset_level()
 
@@ -469,10 +802,8 @@ class Game:
                 self.cam_x += (target_cam - self.cam_x) * 0.1
 
                 p_rect = self.player.get_rect()
-                for s in lvl.spikes:
-                    if p_rect.colliderect(s.rect):
-                        self.reset_level()
-                        break
+                if lvl.spikes.hit(p_rect):
+                    self.reset_level()
 
                 if self.player.get_rect().colliderect(lvl.finish_rect):
                     self.state = "WON"
@@ -492,33 +823,29 @@ class Game:
                 f_draw_pos = (lvl.finish_rect.x - self.cam_x, lvl.finish_rect.y)
                 self.screen.blit(self.door_image, f_draw_pos)
 
-                self.player.draw(self.screen, self.cam_x, self.player_imgs)
+                self.player.draw(self.screen, self.cam_x, self.player_imgs, self.governor.smooth)
 
                 # stars drawing
+                for idx in lvl.stars.collect(self.player.get_rect()):
+                    star_rect = lvl.stars.rects[idx]
+                    self.collected_count += 1
+                    for i in range(self.governor.scale(15)):
+                        vel = (random.uniform(-4, 4), random.uniform(-4, 4))
+                        pos = (star_rect.centerx, star_rect.centery)
+                        self.player.particles.append(Particle(pos, vel, random.randint(3, 6), (255, 215, 0), 30))
+
+                lvl.stars.update()
                 for star in lvl.stars:
-                    if not star.collected and self.player.get_rect().colliderect(star.rect):
-                        star.collected = True
-                        self.collected_count += 1
-                        for i in range(15):
-                            vel = (random.uniform(-4, 4), random.uniform(-4, 4))
-                            pos = (star.rect.centerx, star.rect.centery)
-                            self.player.particles.append(Particle(pos, vel, random.randint(3, 6), (255, 215, 0), 30))
-                    star.draw(self.screen, self.cam_x, self.star_image)
+                    star.draw(self.screen, self.cam_x, self.star_image, self.governor.star_angle_step)
 
                 # UI
-                info = self.small_font.render(f"Level {self.current_level_idx + 1}", True, (200, 200, 200))
+                info = self.text_cache.render(self.small_font, f"Level {self.current_level_idx + 1}", (200, 200, 200))
                 self.screen.blit(info, (20, 20))
 
                 if self.state == "WON":
-                    overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-                    overlay.fill((0, 0, 0, 180))
-                    self.screen.blit(overlay, (0,0))
-                    win_txt = self.font.render("LEVEL COMPLETE!", True, (100, 255, 100))
-                    score_txt = self.stars_font.render(f"STARS: {self.final_score}", True, (255, 215, 0))
-                    prompt = self.small_font.render("Press SPACE for Next Level", True, (255, 255, 255))
-                    self.screen.blit(win_txt, (SCREEN_WIDTH//2 - win_txt.get_width()//2, 250))
-                    self.screen.blit(score_txt, (SCREEN_WIDTH//2 - score_txt.get_width()//2, 310))
-                    self.screen.blit(prompt, (SCREEN_WIDTH//2 - prompt.get_width()//2, 380))
+                    # one layer per score, e.g. "2 / 5"
+                    win_layer = self.text_cache.layer(("WON", self.final_score), self.build_win)
+                    self.screen.blit(win_layer, (0, 0))
             
             fade_surf = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
             fade_surf.fill((0, 0, 0))